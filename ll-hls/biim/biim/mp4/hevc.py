@@ -5,14 +5,23 @@ from biim.util.bitstream import BitStream
 
 escapes = set([0x00, 0x01, 0x02, 0x03])
 
+EMULATION_PREVENTION = b'\x00\x00\x03'
+
 def ebsp2rbsp(data: bytes | bytearray | memoryview) -> bytes:
-  rbsp = bytearray(data[:2])
+  data = bytes(data)
   length = len(data)
-  for index in range(2, length):
-    if index < length - 1 and data[index - 2] == 0x00 and data[index - 1] == 0x00 and data[index + 0] == 0x03 and data[index + 1] in escapes:
-      continue
-    rbsp.append(data[index])
-  return bytes(rbsp)
+  chunks: list[bytes] = []
+  begin = 0
+  index = data.find(EMULATION_PREVENTION)
+  while index >= 0:
+    escape = index + 2
+    if escape < length - 1 and data[escape + 1] in escapes:
+      chunks.append(data[begin:escape])
+      begin = escape + 1
+    index = data.find(EMULATION_PREVENTION, escape + 1)
+  if not chunks: return data
+  chunks.append(data[begin:])
+  return b''.join(chunks)
 
 def hevcTrack(trackId: int, timescale: int, vps: bytes | bytearray | memoryview, sps: bytes | bytearray | memoryview, pps: bytes | bytearray | memoryview) -> bytes:
   general_profile_space: int | None = None
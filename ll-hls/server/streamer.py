@@ -5,10 +5,12 @@ import asyncio
 import json
 import logging
 import os
+import queue
 import sys
+import threading
 import time
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 import socket
 
 from aiohttp import web
@@ -32,6 +34,13 @@ _SEGMENT_TIMESTAMPS: Dict[str, int] = {}
 _PART_TIMESTAMPS: Dict[str, int] = {}
 _CURRENT_SEGMENT_INDEX = 0
 _CLIENT_LAST_SEEN: Dict[str, float] = {}
+# Offset from the monotonic clock to wall-clock time, captured once at startup so
+# published timestamps stay comparable with client Date.now() values.
+_WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+# Make the zerolatency guarantees explicit: no lookahead, B-frames or frame threading.
+X264_LOW_LATENCY_PARAMS = (
+    "no-scenecut=1:bframes=0:intra-refresh=0:rc-lookahead=0:sync-lookahead=0:sliced-threads=0:threads=1"
+)
 
 
 class ServerMetricsMonitor:
@@ -198,8 +207,68 @@ class ServerMetricsMonitor:
                 f.write(line)
 
 
-def _record_new_segments_from_m3u8(m3u8_obj: Any) -> None:
-    """Update the timestamp map using the absolute media sequence."""
+def _drain_ffmpeg_log(lines: "queue.SimpleQueue[Optional[str]]") -> None:
+    """Log queued FFmpeg stderr lines from a worker thread, one record per burst."""
+    while True:
+        batch = [lines.get()]
+        try:
+            while batch[-1] is not None:
+                batch.append(lines.get_nowait())
+        except queue.Empty:
+            pass
+        text = "\n".join(line for line in batch if line is not None)
+        if text:
+            LOG.info("FFmpeg: %s", text)
+        if batch[-1] is None:
+            return
+
+
+class TSPipeProtocol(asyncio.Protocol):
+    """Append FFmpeg stdout into a shared bytearray and wake the demux loop."""
+
+    def __init__(self, buffer: bytearray, high_water: int = 1 << 20) -> None:
+        self.buffer = buffer
+        self.high_water = high_water
+        self.eof = False
+        self._ready = asyncio.Event()
+        self._transport: Optional[asyncio.ReadTransport] = None
+        self._paused = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport  # type: ignore[assignment]
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+        self._ready.set()
+        if not self._paused and len(self.buffer) >= self.high_water:
+            self._paused = True
+            self._transport.pause_reading()
+
+    def eof_received(self) -> None:
+        self.eof = True
+        self._ready.set()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.eof = True
+        self._ready.set()
+
+    async def wait(self) -> None:
+        """Block until new bytes (or EOF) arrived since the last wait."""
+        await self._ready.wait()
+        self._ready.clear()
+
+    def consumed(self) -> None:
+        """Resume the pipe once the demux loop has drained the backlog."""
+        if self._paused and len(self.buffer) < self.high_water // 2:
+            self._paused = False
+            self._transport.resume_reading()
+
+
+def _record_new_segments_from_m3u8(m3u8_obj: Any, now_ns: int) -> None:
+    """Update the timestamp map using the absolute media sequence.
+
+    ``now_ns`` is a ``time.monotonic_ns()`` reading taken by the caller.
+    """
     global _CURRENT_SEGMENT_INDEX, _SEGMENT_TIMESTAMPS
     if not hasattr(m3u8_obj, "segments"):
         return
@@ -218,7 +287,7 @@ def _record_new_segments_from_m3u8(m3u8_obj: Any) -> None:
     if latest_file_index <= _CURRENT_SEGMENT_INDEX:
         return
 
-    now = time.time_ns()
+    now = now_ns + _WALL_OFFSET_NS
     for file_index in range(_CURRENT_SEGMENT_INDEX + 1, latest_file_index + 1):
         segment_name = f"segment{file_index:05d}.m4s"
         _SEGMENT_TIMESTAMPS[segment_name] = now
@@ -243,12 +312,20 @@ def build_ffmpeg_command(args) -> list[str]:
         inputs = ["-f", "v4l2", "-video_size", f"{w}x{h}", "-framerate", str(args.framerate),
                   "-i", args.device, "-f", "lavfi", "-i", "anullsrc=r=48000:cl=stereo"]
     
+    encoder = []
+    if args.x264_params:
+        encoder += ["-x264-params", f"keyint={args.gop}:min-keyint={args.gop}:{args.x264_params}"]
+    if args.part_keyframes:
+        # Start every LL-HLS part on an IDR so parts can close without waiting for the GOP
+        encoder += ["-force_key_frames", f"expr:gte(t,n_forced*{args.part_duration})"]
+
     return [
-        "ffmpeg", "-hide_banner", "-loglevel", "info", *inputs,
+        "ffmpeg", "-hide_banner", "-loglevel", "warning", "-nostats", *inputs,
         "-vf", f"format=yuv420p,drawtext=fontsize=24:fontcolor=red:x=10:y=10:text='%{{localtime}}'",
         "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
         "-profile:v", "baseline", "-pix_fmt", "yuv420p", "-b:v", f"{args.bitrate}k",
         "-g", str(args.gop), "-keyint_min", str(args.gop), "-sc_threshold", "0", "-bf", "0",
+        *encoder,
         "-shortest", "-c:a", "aac", "-b:a", "128k", "-ar", "48000", "-ac", "2",
         "-f", "mpegts", "-"
     ]
@@ -259,7 +336,7 @@ async def handle_timestamps(request: web.Request) -> web.Response:
     data = {
         "segments": _SEGMENT_TIMESTAMPS,
         "parts": _PART_TIMESTAMPS,
-        "timestamp": time.time_ns()
+        "timestamp": time.monotonic_ns() + _WALL_OFFSET_NS
     }
     return web.Response(
         text=json.dumps(data),
@@ -334,16 +411,30 @@ async def run_pipeline(args) -> None:
         LOG.info("Access URL: http://%s:%s/", addr, args.port)
     LOG.info(f"Server running at http://0.0.0.0:{args.port}")
     
-    # Start FFmpeg
+    # Start FFmpeg; its stdout is a raw pipe drained into one shared buffer
     cmd = build_ffmpeg_command(args)
     LOG.info(f"FFmpeg: {' '.join(cmd)}")
-    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    read_fd, write_fd = os.pipe()
+    try:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=write_fd, stderr=asyncio.subprocess.PIPE)
+    finally:
+        os.close(write_fd)
     monitor.set_ffmpeg_pid(proc.pid)
+    ts_buffer = bytearray()
+    pipe_transport, pipe = await asyncio.get_running_loop().connect_read_pipe(
+        lambda: TSPipeProtocol(ts_buffer), os.fdopen(read_fd, "rb", buffering=0)
+    )
     
-    # Log FFmpeg output
+    # Log FFmpeg output off the event loop
+    ffmpeg_log: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+    threading.Thread(target=_drain_ffmpeg_log, args=(ffmpeg_log,), name="ffmpeg-log", daemon=True).start()
+
     async def log_stderr():
-        async for line in proc.stderr:
-            LOG.info(f"FFmpeg: {line.decode().strip()}")
+        try:
+            async for line in proc.stderr:
+                ffmpeg_log.put_nowait(line.decode(errors="replace").strip())
+        finally:
+            ffmpeg_log.put_nowait(None)
     asyncio.create_task(log_stderr())
     
     # MPEG-TS parsers
@@ -354,72 +445,84 @@ async def run_pipeline(args) -> None:
     
     pmt_pid = h264_pid = aac_pid = None
     frame_count = 0
+    now_ns = time.monotonic_ns()
+
+    def on_h264(packet: memoryview) -> None:
+        nonlocal frame_count
+        h264_parser.push(packet)
+        for pes in h264_parser:
+            handler.h264(pes)
+            frame_count += 1
+            if frame_count <= 5 or frame_count % 100 == 0:
+                LOG.info(f"Frame {frame_count}: init={handler.init.done()}")
+            
+            # Track segments using the same logic as original
+            if hasattr(handler, 'm3u8'):
+                _record_new_segments_from_m3u8(handler.m3u8, now_ns)
+
+    def on_aac(packet: memoryview) -> None:
+        aac_parser.push(packet)
+        for pes in aac_parser:
+            handler.aac(pes)
+
+    def on_pat(packet: memoryview) -> None:
+        nonlocal pmt_pid
+        pat_parser.push(packet)
+        for pat in pat_parser:
+            if pat.CRC32() == 0:
+                for num, map_pid in pat:
+                    if num != 0 and not pmt_pid:
+                        pmt_pid = map_pid
+                        pid_handlers[pmt_pid] = on_pmt
+                        LOG.info(f"PMT PID: {pmt_pid}")
+
+    def on_pmt(packet: memoryview) -> None:
+        nonlocal h264_pid, aac_pid
+        pmt_parser.push(packet)
+        for pmt in pmt_parser:
+            if pmt.CRC32() == 0:
+                for stream_type, elem_pid, _ in pmt:
+                    if stream_type == 0x1b and not h264_pid:
+                        h264_pid = elem_pid
+                        pid_handlers[h264_pid] = on_h264
+                        LOG.info(f"H.264 PID: {h264_pid}")
+                    elif stream_type == 0x0f and not aac_pid:
+                        aac_pid = elem_pid
+                        pid_handlers[aac_pid] = on_aac
+                        LOG.info(f"AAC PID: {aac_pid}")
+
+    # PID -> handler; PMT and elementary stream PIDs are added as they are discovered
+    pid_handlers: Dict[int, Callable[[memoryview], None]] = {0x00: on_pat}
     
     try:
-        while True:
-            sync = await proc.stdout.read(1)
-            if not sync:
-                break
-            if sync != ts.SYNC_BYTE:
-                continue
-            
-            try:
-                packet = ts.SYNC_BYTE + await proc.stdout.readexactly(ts.PACKET_SIZE - 1)
-            except asyncio.IncompleteReadError:
-                break
-            
-            pid = ts.pid(packet)
-            
-            # PCR
-            if ts.has_pcr(packet):
-                handler.pcr(ts.pcr(packet))
-            
-            # H.264
-            if pid == h264_pid:
-                h264_parser.push(packet)
-                for pes in h264_parser:
-                    handler.h264(pes)
-                    frame_count += 1
-                    if frame_count <= 5 or frame_count % 100 == 0:
-                        LOG.info(f"Frame {frame_count}: init={handler.init.done()}")
-                    
-                    # Track segments using the same logic as original
-                    if hasattr(handler, 'm3u8'):
-                        _record_new_segments_from_m3u8(handler.m3u8)
-            
-            # AAC
-            elif pid == aac_pid:
-                aac_parser.push(packet)
-                for pes in aac_parser:
-                    handler.aac(pes)
-            
-            # PAT
-            elif pid == 0x00:
-                pat_parser.push(packet)
-                for pat in pat_parser:
-                    if pat.CRC32() == 0:
-                        for num, map_pid in pat:
-                            if num != 0 and not pmt_pid:
-                                pmt_pid = map_pid
-                                LOG.info(f"PMT PID: {pmt_pid}")
-            
-            # PMT
-            elif pid == pmt_pid:
-                pmt_parser.push(packet)
-                for pmt in pmt_parser:
-                    if pmt.CRC32() == 0:
-                        for stream_type, elem_pid, _ in pmt:
-                            if stream_type == 0x1b and not h264_pid:
-                                h264_pid = elem_pid
-                                LOG.info(f"H.264 PID: {h264_pid}")
-                            elif stream_type == 0x0f and not aac_pid:
-                                aac_pid = elem_pid
-                                LOG.info(f"AAC PID: {aac_pid}")
+        while not (pipe.eof and len(ts_buffer) < ts.PACKET_SIZE):
+            await pipe.wait()
+            now_ns = time.monotonic_ns()
+            end = len(ts_buffer)
+            pos = 0
+            with memoryview(ts_buffer) as view:
+                while True:
+                    if pos < end and ts_buffer[pos] != ts.SYNC_BYTE[0]:
+                        pos = ts_buffer.find(ts.SYNC_BYTE, pos)
+                        if pos < 0:
+                            pos = end
+                    if end - pos < ts.PACKET_SIZE:
+                        break
+                    with view[pos:pos + ts.PACKET_SIZE] as packet:
+                        pos += ts.PACKET_SIZE
+                        if ts.has_pcr(packet):
+                            handler.pcr(ts.pcr(packet))
+                        on_packet = pid_handlers.get(ts.pid(packet))
+                        if on_packet is not None:
+                            on_packet(packet)
+            del ts_buffer[:pos]
+            pipe.consumed()
     
     except asyncio.CancelledError:
         LOG.info("Cancelled")
     finally:
         monitor.set_ffmpeg_pid(None)
+        pipe_transport.close()
         proc.terminate()
         await proc.wait()
         await runner.cleanup()
@@ -433,6 +536,8 @@ def main():
     p.add_argument("--framerate", default=30, type=int)
     p.add_argument("--bitrate", default=1000, type=int)
     p.add_argument("--gop", default=30, type=int, help="Keyframe interval")
+    p.add_argument("--x264-params", default=X264_LOW_LATENCY_PARAMS, help="Extra libx264 options appended after keyint/min-keyint (empty string to disable)")
+    p.add_argument("--part-keyframes", action="store_true", help="Force an IDR at every part boundary (costs bitrate)")
     p.add_argument("--target-duration", default=1, type=int)
     p.add_argument("--part-duration", default=0.1, type=float)
     p.add_argument("--window-size", default=5, type=int)
@@ -0,0 +1,20 @@
+"""Run independent plot functions in worker processes."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+# A plot function and its positional arguments, run in a worker process.
+PlotJob = tuple[Callable[..., None], tuple]
+
+
+def _plot_one(job: PlotJob) -> None:
+    plot_fn, plot_args = job
+    plot_fn(*plot_args)
+
+
+def run_plot_jobs(jobs: list[PlotJob]) -> None:
+    """Render independent figures in worker processes (each has its own Agg backend)."""
+    if not jobs:
+        return
+    with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as executor:
+        list(executor.map(_plot_one, jobs))
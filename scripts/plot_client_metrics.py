@@ -1,14 +1,25 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
 import argparse
 import os
+from typing import TYPE_CHECKING
 
 os.environ.setdefault("MPLCONFIGDIR", os.path.join(os.getcwd(), ".mplconfig"))
 
-import pandas as pd
-import seaborn as sns
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import matplotlib.style
+
+from _plot_jobs import PlotJob, run_plot_jobs
+
+# seaborn's whitegrid look without importing seaborn; pandas and pyplot are
+# imported where they are used so --help and argument errors return quickly.
+if "seaborn-v0_8-whitegrid" in matplotlib.style.available:
+    matplotlib.style.use("seaborn-v0_8-whitegrid")
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 METRICS = [
@@ -44,23 +55,34 @@ METRIC_LABELS = {
 
 
 def load_csv(path: str, label: str) -> pd.DataFrame:
+    import pandas as pd
+
     df = pd.read_csv(path)
     df["protocol"] = label
     return df
 
 
-def plot_metric(df: pd.DataFrame, metric: str, output_dir: str, smooth_window: int) -> None:
+def prepare_metric(df: pd.DataFrame, metric: str, smooth_window: int) -> tuple[pd.DataFrame, str]:
+    """Return metric averaged per (protocol, num_clients), plus the (optionally smoothed) y column."""
+    # The CSVs are appended across runs, so a client count can appear more than once.
+    frame = df.groupby(["protocol", "num_clients"], sort=True)[metric].mean().reset_index()
+    if not smooth_window or smooth_window <= 1:
+        return frame, metric
+    smooth_col = f"{metric}__smooth"
+    frame[smooth_col] = (
+        frame.groupby("protocol")[metric]
+        .transform(lambda s: s.rolling(smooth_window, center=True, min_periods=1).mean())
+    )
+    return frame, smooth_col
+
+
+def plot_metric(df: pd.DataFrame, metric: str, y_col: str, output_dir: str) -> None:
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(8, 4))
-    y_col = metric
-    if smooth_window and smooth_window > 1:
-        df = df.sort_values(["protocol", "num_clients"]).copy()
-        smooth_col = f"{metric}__smooth"
-        df[smooth_col] = (
-            df.groupby("protocol")[metric]
-            .transform(lambda s: s.rolling(smooth_window, center=True, min_periods=1).mean())
-        )
-        y_col = smooth_col
-    sns.lineplot(data=df, x="num_clients", y=y_col, hue="protocol", marker="o")
+    for protocol, subset in df.groupby("protocol", sort=False):
+        series = subset.groupby("num_clients", sort=True)[y_col].mean()
+        plt.plot(series.index.to_numpy(), series.to_numpy(), marker="o", label=protocol)
     label = METRIC_LABELS.get(metric, metric)
     plt.title(label)
     plt.xlabel("Number of Clients")
@@ -104,6 +126,8 @@ def main() -> None:
     )
     args = parser.parse_args()
 
+    import pandas as pd
+
     os.makedirs(args.out, exist_ok=True)
 
     df_webrtc = load_csv(args.webrtc, "WebRTC")
@@ -114,14 +138,13 @@ def main() -> None:
     df = df.dropna(subset=["num_clients"])
     df = df.sort_values(["num_clients", "protocol"])
 
-    for metric in METRICS:
+    metrics = METRICS + (STALL_METRICS if args.include_stalls else [])
+    jobs: list[PlotJob] = []
+    for metric in metrics:
         if metric in df.columns:
-            plot_metric(df, metric, args.out, args.smooth_window)
-
-    if args.include_stalls:
-        for metric in STALL_METRICS:
-            if metric in df.columns:
-                plot_metric(df, metric, args.out, args.smooth_window)
+            frame, y_col = prepare_metric(df, metric, args.smooth_window)
+            jobs.append((plot_metric, (frame, metric, y_col, args.out)))
+    run_plot_jobs(jobs)
 
     print(f"Wrote plots to {args.out}")
 
@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
 import argparse
 import os
+from typing import TYPE_CHECKING
 
 # Ensure matplotlib cache dir is writable before importing it.
 os.environ.setdefault("MPLCONFIGDIR", os.path.join(os.getcwd(), ".mplconfig"))
 
-import pandas as pd
-import seaborn as sns
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import matplotlib.style
+
+from _plot_jobs import PlotJob, run_plot_jobs
+
+# seaborn's whitegrid look without importing seaborn; pandas and pyplot are
+# imported where they are used so --help and argument errors return quickly.
+if "seaborn-v0_8-whitegrid" in matplotlib.style.available:
+    matplotlib.style.use("seaborn-v0_8-whitegrid")
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 METRICS = [
@@ -17,6 +28,7 @@ METRICS = [
     "avg_sys_mem_pct",
     "avg_proc_cpu_pct",
     "avg_proc_rss_mb",
+    "avg_proc_rss_delta_mb",
     "avg_net_rx_kbps",
     "net_counter_out_bytes",
     "net_out_mbps",
@@ -30,6 +42,7 @@ METRIC_LABELS = {
     "avg_sys_mem_pct": "Average System Memory (%)",
     "avg_proc_cpu_pct": "Average Process CPU (%)",
     "avg_proc_rss_mb": "Average Process RSS (MB)",
+    "avg_proc_rss_delta_mb": "Average Process RSS Growth in Window (MB)",
     "avg_net_rx_kbps": "Average Network RX (kbps)",
     "net_counter_out_bytes": "Total Egress Bytes",
     "net_out_mbps": "Average Egress (Mbps)",
@@ -40,12 +53,16 @@ METRIC_LABELS = {
 
 
 def load_csv(path: str, label: str) -> pd.DataFrame:
+    import pandas as pd
+
     df = pd.read_csv(path)
     df["protocol"] = label
     return df
 
 
 def add_network_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    import pandas as pd
+
     numeric_cols = [
         "connected_clients",
         "duration_sec",
@@ -77,8 +94,13 @@ def add_network_metrics(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def plot_metric(df: pd.DataFrame, metric: str, output_dir: str, x_col: str) -> None:
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(8, 4))
-    sns.lineplot(data=df, x=x_col, y=metric, hue="protocol", marker="o")
+    for protocol, subset in df.groupby("protocol", sort=False):
+        # The CSVs are appended across runs; average repeated client counts.
+        series = subset.groupby(x_col, sort=True)[metric].mean()
+        plt.plot(series.index.to_numpy(), series.to_numpy(), marker="o", label=protocol)
     label = METRIC_LABELS.get(metric, metric)
     plt.title(label)
     plt.xlabel("Number of Clients")
@@ -99,20 +121,15 @@ def plot_metric_by_protocol(df: pd.DataFrame, metric: str, output_dir: str, x_co
     ordered += [p for p in protocols if p not in ordered]
     label = METRIC_LABELS.get(metric, metric)
 
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(1, len(ordered), figsize=(6 * len(ordered), 4))
     if len(ordered) == 1:
         axes = [axes]
     for ax, protocol in zip(axes, ordered):
-        subset = df[df["protocol"] == protocol]
+        series = df[df["protocol"] == protocol].groupby(x_col, sort=True)[metric].mean()
         color = "#f28e2b" if protocol == "WebRTC" else None
-        sns.lineplot(
-            data=subset,
-            x=x_col,
-            y=metric,
-            marker="o",
-            ax=ax,
-            color=color,
-        )
+        ax.plot(series.index.to_numpy(), series.to_numpy(), marker="o", color=color)
         ax.set_title(f"{label} - {protocol}")
         ax.set_xlabel("Number of Clients")
         ax.set_ylabel(label)
@@ -144,6 +161,8 @@ def main() -> None:
     )
     args = parser.parse_args()
 
+    import pandas as pd
+
     os.makedirs(args.out, exist_ok=True)
 
     df_webrtc = load_csv(args.webrtc, "WebRTC")
@@ -159,12 +178,15 @@ def main() -> None:
     df = df.dropna(subset=[x_col])
     df = df.sort_values([x_col, "protocol"])
 
+    jobs: list[PlotJob] = []
     for metric in METRICS:
         if metric not in df.columns:
             continue
-        plot_metric(df, metric, args.out, x_col)
+        frame = df[["protocol", x_col, metric]]
+        jobs.append((plot_metric, (frame, metric, args.out, x_col)))
         if metric == "avg_proc_rss_mb":
-            plot_metric_by_protocol(df, metric, args.out, x_col)
+            jobs.append((plot_metric_by_protocol, (frame, metric, args.out, x_col)))
+    run_plot_jobs(jobs)
 
     print(f"Wrote plots to {args.out}")
 
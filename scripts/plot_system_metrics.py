@@ -6,9 +6,8 @@ os.environ.setdefault("MPLCONFIGDIR", os.path.join(os.getcwd(), ".mplconfig"))
 
 import pandas as pd
 import seaborn as sns
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
 
 METRICS = [
@@ -16,24 +15,50 @@ METRICS = [
     ("avg_mem_pct", "MacBook Average Memory (%)"),
 ]
 
+PROTOCOLS = ["LL-HLS", "WebRTC"]
+
+FLOAT_COLUMNS = ("avg_cpu_pct", "avg_mem_pct")
+
 
 def load_csv(path: str, label: str) -> pd.DataFrame:
     df = pd.read_csv(path)
-    df["protocol"] = label
-    return df
+    # Coerce instead of a strict read_csv dtype so malformed rows are dropped, not fatal.
+    df["num_clients"] = pd.to_numeric(df["num_clients"], errors="coerce")
+    df = df.dropna(subset=["num_clients"])
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    # The clients write their own lowercase "protocol" column; replace it with the label.
+    return df.assign(protocol=label)
 
 
 def plot_metric(df: pd.DataFrame, metric: str, label: str, output_dir: str) -> None:
-    plt.figure(figsize=(8, 4))
-    sns.lineplot(data=df, x="num_clients", y=metric, hue="protocol", marker="o")
-    plt.title(label)
-    plt.xlabel("Number of Clients")
-    plt.ylabel(label)
-    plt.legend(title="Protocol")
-    plt.tight_layout()
+    if not df[metric].notna().any():
+        print(f"Skipping {metric}: no values to plot")
+        return
+    # A standalone Figure on the Agg canvas: nothing is registered with pyplot, so
+    # there is no global figure state to close or leak between calls.
+    fig = Figure(figsize=(8, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    # lineplot already sorts x within each hue, so the frame is passed unsorted.
+    sns.lineplot(
+        data=df,
+        x="num_clients",
+        y=metric,
+        hue="protocol",
+        hue_order=PROTOCOLS,
+        marker="o",
+        errorbar=None,
+        ax=ax,
+    )
+    ax.set_title(label)
+    ax.set_xlabel("Number of Clients")
+    ax.set_ylabel(label)
+    ax.legend(title="Protocol")
+    fig.tight_layout()
     out_path = os.path.join(output_dir, f"{metric}.png")
-    plt.savefig(out_path, dpi=150)
-    plt.close()
+    fig.savefig(out_path, dpi=150)
 
 
 def main() -> None:
@@ -59,13 +84,13 @@ def main() -> None:
 
     os.makedirs(args.out, exist_ok=True)
 
-    df_webrtc = load_csv(args.webrtc, "WebRTC")
-    df_llhls = load_csv(args.llhls, "LL-HLS")
-    df = pd.concat([df_webrtc, df_llhls], ignore_index=True)
-
-    df["num_clients"] = pd.to_numeric(df["num_clients"], errors="coerce")
-    df = df.dropna(subset=["num_clients"])
-    df = df.sort_values(["num_clients", "protocol"])
+    sources = {"LL-HLS": args.llhls, "WebRTC": args.webrtc}
+    df = pd.concat([load_csv(path, label) for label, path in sources.items()], ignore_index=True)
+    if df.empty:
+        raise SystemExit("No usable rows in the system metrics CSVs; nothing to plot")
+    for label in PROTOCOLS:
+        if not (df["protocol"] == label).any():
+            print(f"Warning: no {label} rows found in {sources[label]}")
 
     for metric, label in METRICS:
         if metric not in df.columns:
@@ -32,7 +32,10 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--video-input-format",
         # default="mjpeg",
-        help="Pixel format for the video device, e.g. mjpeg or yuyv422 (passed to ffmpeg as -input_format).",
+        help=(
+            "Pixel format for the video device, e.g. mjpeg or yuyv422 (passed to ffmpeg as -input_format). "
+            "Use h264 together with --video-codec video/H264 to send the camera's H.264 without re-encoding."
+        ),
     )
     parser.add_argument(
         "--video-size",
@@ -86,6 +89,11 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Network interface name for metrics (e.g. eth0, lo). Defaults to host-wide counters.",
     )
+    parser.add_argument(
+        "--sweep-control",
+        action="store_true",
+        help="Expose POST /sweep/next so run_metrics_sweep.py can reuse one server for every step",
+    )
     return parser
 
 
@@ -39,7 +39,15 @@ def open_media_source(config: argparse.Namespace) -> Optional[MediaPlayer]:
         options["input_format"] = config.video_input_format
     if config.video_size:
         options["video_size"] = config.video_size
-    player = MediaPlayer(config.video_device, format=config.video_format, options=options)
+    # A device that already emits H.264 can feed aiortc's packetizer directly when
+    # the peer is forced to H.264, skipping the decode + re-encode round trip.
+    passthrough = config.video_input_format == "h264" and config.video_codec == "video/H264"
+    player = MediaPlayer(
+        config.video_device,
+        format=config.video_format,
+        options=options,
+        decode=not passthrough,
+    )
     _attach_player_logging(player)
     return player
 
@@ -1,39 +1,53 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import json
 import os
+import re
 import signal
+import ssl
 import subprocess
 import sys
 import time
+import urllib.parse
+import urllib.request
 from pathlib import Path
 
-METRICS_DONE = "Metrics window complete"
+STDOUT_READ_LIMIT = 1 << 16
+SERVER_START_TIMEOUT = 60.0
+# Extra time allowed per /sweep/next request beyond the connect wait and metrics window.
+STEP_TIMEOUT_SLACK = 30.0
 DEFAULT_METRICS_HEADER = (
     "timestamp,session_id,expected_clients,connected_clients,duration_sec,"
     "avg_sys_cpu_pct,avg_sys_mem_pct,avg_proc_cpu_pct,avg_proc_rss_mb,"
-    "avg_net_rx_kbps,avg_net_tx_kbps,samples"
+    "avg_proc_rss_delta_mb,avg_net_rx_kbps,avg_net_tx_kbps,samples"
 )
+TAIL_BLOCK_SIZE = 4096
+FORWARD_FLUSH_BYTES = 8192
+FORWARD_FLUSH_DELAY = 0.05
+METRICS_DONE = b"Metrics window complete"
 NET_COUNTER_COLUMNS = [
     "net_counter_in_bytes",
     "net_counter_out_bytes",
     "net_counter_in_packets",
     "net_counter_out_packets",
 ]
+NET_COUNTER_SET = frozenset(NET_COUNTER_COLUMNS)
+_SERVER_DIR = Path(__file__).resolve().parent
+_REPO_ROOT = _SERVER_DIR.parent
+_DEFAULT_COUNTER = _REPO_ROOT / "scripts" / "net_counters.sh"
+# Whole whitespace-delimited key=<integer> tokens, as printed by net_counters.sh summary.
+_KV_RE = re.compile(r"(?<!\S)([^\s=]+)=(-?\d+)(?!\S)")
 
 
 def _counter_script_path(args: argparse.Namespace) -> Path:
-    if args.net_counter_script:
-        return Path(args.net_counter_script)
-    repo_root = Path(__file__).resolve().parent.parent
-    return repo_root / "scripts" / "net_counters.sh"
+    return Path(args.net_counter_script) if args.net_counter_script else _DEFAULT_COUNTER
 
 
 def _run_net_counter(args: argparse.Namespace, action: str) -> str | None:
-    if not args.net_iface or not args.net_clients:
-        return None
-    script_path = _counter_script_path(args)
-    if not script_path.exists():
-        print(f"[sweep] net counter script not found at {script_path}")
+    # main() resolves the script once; None means counters are off or the script is missing.
+    script_path = args.net_counter_path
+    if script_path is None:
         return None
     cmd = [str(script_path), action]
     if action == "setup":
@@ -57,43 +71,70 @@ def _run_net_counter(args: argparse.Namespace, action: str) -> str | None:
 def _parse_net_summary(output: str | None) -> dict[str, int]:
     if not output:
         return {}
-    values: dict[str, int] = {}
-    for token in output.split():
-        if "=" not in token:
-            continue
-        key, raw = token.split("=", 1)
-        try:
-            values[key] = int(raw)
-        except ValueError:
-            continue
-    return values
+    return {key: int(raw) for key, raw in _KV_RE.findall(output)}
 
 
-def _metrics_output_path(server_dir: Path, server_args: list[str]) -> Path:
-    metrics_output = None
-    if "--metrics-output" in server_args:
-        idx = server_args.index("--metrics-output")
+def _server_arg(server_args: list[str], flag: str) -> str | None:
+    if flag in server_args:
+        idx = server_args.index(flag)
         if idx + 1 < len(server_args):
-            metrics_output = server_args[idx + 1]
-    metrics_output = metrics_output or "server_metrics.csv"
+            return server_args[idx + 1]
+    return None
+
+
+def _control_url(server_args: list[str]) -> str:
+    host = _server_arg(server_args, "--host") or "127.0.0.1"
+    if host in ("0.0.0.0", "::"):
+        host = "127.0.0.1"
+    port = _server_arg(server_args, "--port") or "8080"
+    scheme = "https" if "--cert-file" in server_args else "http"
+    return f"{scheme}://{host}:{port}/sweep/next"
+
+
+def _metrics_output_path(server_dir: Path, server_args: list[str]) -> Path:
+    metrics_output = _server_arg(server_args, "--metrics-output") or "server_metrics.csv"
     path = Path(metrics_output)
     if not path.is_absolute():
         return server_dir / path
     return path
 
 
-def _update_metrics_csv(metrics_path: Path, summary: dict[str, int]) -> None:
-    if not summary or not metrics_path.exists():
-        return
+def _last_row_offset(f, size: int) -> int:
+    """Return the byte offset of the last non-empty line, reading backwards from EOF."""
+    pos = size
+    tail = b""
+    while pos > 0:
+        step = min(TAIL_BLOCK_SIZE, pos)
+        pos -= step
+        f.seek(pos)
+        tail = f.read(step) + tail
+        newline = tail.rstrip().rfind(b"\n")
+        if newline >= 0:
+            return pos + newline + 1
+    return 0
+
+
+def _apply_counters(row: str, header_cols: list[str], mapping: dict[str, int]) -> str:
+    col_idx = {name: i for i, name in enumerate(header_cols)}
+    row_cols = row.split(",")
+    if len(row_cols) < len(header_cols):
+        row_cols.extend([""] * (len(header_cols) - len(row_cols)))
+    for key, value in mapping.items():
+        i = col_idx.get(key)
+        if i is not None:
+            row_cols[i] = str(value)
+    return ",".join(row_cols)
+
+
+def _rewrite_metrics_csv(metrics_path: Path, mapping: dict[str, int]) -> None:
     content = metrics_path.read_text().splitlines()
     if not content:
         return
     if "timestamp" not in content[0]:
         content.insert(0, DEFAULT_METRICS_HEADER)
     header_cols = content[0].split(",")
-    for col in NET_COUNTER_COLUMNS:
-        if col not in header_cols:
-            header_cols.append(col)
+    present = set(header_cols)
+    header_cols.extend(col for col in NET_COUNTER_COLUMNS if col not in present)
     content[0] = ",".join(header_cols)
 
     idx = len(content) - 1
@@ -101,91 +142,203 @@ def _update_metrics_csv(metrics_path: Path, summary: dict[str, int]) -> None:
         idx -= 1
     if idx <= 0:
         return
-    row_cols = content[idx].split(",")
-    while len(row_cols) < len(header_cols):
-        row_cols.append("")
+    content[idx] = _apply_counters(content[idx], header_cols, mapping)
+    metrics_path.write_text("\n".join(content) + "\n")
+
 
+def _update_metrics_csv(metrics_path: Path, summary: dict[str, int]) -> None:
+    if not summary or not metrics_path.exists():
+        return
     mapping = {
         "net_counter_in_bytes": summary.get("in_bytes", 0),
         "net_counter_out_bytes": summary.get("out_bytes", 0),
         "net_counter_in_packets": summary.get("in_packets", 0),
         "net_counter_out_packets": summary.get("out_packets", 0),
     }
-    for key, value in mapping.items():
-        try:
-            col_idx = header_cols.index(key)
-        except ValueError:
-            continue
-        row_cols[col_idx] = str(value)
-    content[idx] = ",".join(row_cols)
-    metrics_path.write_text("\n".join(content) + "\n")
+    with metrics_path.open("r+b") as f:
+        header = f.readline().decode().rstrip("\r\n")
+        header_cols = header.split(",")
+        if "timestamp" not in header or not NET_COUNTER_SET.issubset(header_cols):
+            needs_header = True
+        else:
+            # Steady state: only the trailing row changes, so rewrite it in place.
+            needs_header = False
+            size = f.seek(0, os.SEEK_END)
+            row_off = _last_row_offset(f, size)
+            if row_off == 0:
+                return
+            f.seek(row_off)
+            row = f.read().decode().rstrip()
+            f.seek(row_off)
+            f.truncate()
+            f.write((_apply_counters(row, header_cols, mapping) + "\n").encode())
+    if needs_header:
+        # First sweep iteration: the counter columns have to be added to the header.
+        _rewrite_metrics_csv(metrics_path, mapping)
 
 
-def run_server(
-    expected: int, args: argparse.Namespace, metrics_path: Path
-) -> tuple[int, dict[str, int]]:
+async def start_server(args: argparse.Namespace, server_args: list[str]) -> asyncio.subprocess.Process:
     env = os.environ.copy()
     env["PYTHONUNBUFFERED"] = "1"
-    server_dir = Path(__file__).resolve().parent
-    server_path = server_dir / "server.py"
+    server_path = _SERVER_DIR / "server.py"
     cmd = [
         sys.executable,
         "-u",
         str(server_path),
         "--expected-clients",
-        str(expected),
+        "0",
+        "--sweep-control",
         "--connect-timeout",
         str(args.connect_timeout),
         "--metrics-duration",
         str(args.metrics_duration),
     ]
-    server_args = list(args.server_args)
-    if server_args[:1] == ["--"]:
-        server_args = server_args[1:]
     cmd.extend(server_args)
 
-    print(f"[sweep] starting expected_clients={expected}")
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
+    print("[sweep] starting server", flush=True)
+    return await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=STDOUT_READ_LIMIT,
         env=env,
-        cwd=args.workdir or str(server_dir),
+        cwd=args.workdir or str(_SERVER_DIR),
+    )
+
+
+async def _forward_output(stream: asyncio.StreamReader, state: dict[str, int]) -> None:
+    out = sys.stdout.buffer
+    loop = asyncio.get_running_loop()
+    buf = bytearray()
+    timer: asyncio.TimerHandle | None = None
+
+    def flush() -> None:
+        nonlocal timer
+        if timer is not None:
+            timer.cancel()
+            timer = None
+        if buf:
+            out.write(buf)
+            out.flush()
+            buf.clear()
+
+    # Forward raw bytes tagged with the sweep step currently running. Output is read
+    # in fixed-size chunks and split with find(), so a line of any length is streamed
+    # through instead of tripping StreamReader's line limit. Batches are written once
+    # the buffer fills, a step finishes, or after a short delay.
+    at_line_start = True
+    try:
+        while chunk := await stream.read(STDOUT_READ_LIMIT):
+            view = memoryview(chunk)
+            start = 0
+            while start < len(chunk):
+                newline = chunk.find(b"\n", start)
+                end = len(chunk) if newline < 0 else newline + 1
+                if at_line_start:
+                    buf += b"[%d] " % state["expected"]
+                buf += view[start:end]
+                at_line_start = newline >= 0
+                start = end
+            if len(buf) > FORWARD_FLUSH_BYTES or METRICS_DONE in chunk:
+                flush()
+            elif timer is None:
+                timer = loop.call_later(FORWARD_FLUSH_DELAY, flush)
+    finally:
+        flush()
+
+
+async def _wait_for_server(proc: asyncio.subprocess.Process, url: str) -> bool:
+    parts = urllib.parse.urlsplit(url)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while proc.returncode is None and time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        except OSError:
+            await asyncio.sleep(0.2)
+            continue
+        writer.close()
+        await writer.wait_closed()
+        return True
+    return False
+
+
+def _post_json(url: str, payload: dict, timeout: float) -> dict:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    # The server is local and typically uses a self-signed certificate when --cert-file is set.
+    context = ssl._create_unverified_context() if url.startswith("https") else None
+    with urllib.request.urlopen(request, context=context, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+async def run_step(
+    expected: int, args: argparse.Namespace, url: str, metrics_path: Path
+) -> dict[str, int]:
+    print(f"[sweep] running expected_clients={expected}", flush=True)
+    await asyncio.to_thread(
+        _post_json,
+        url,
+        {"expected_clients": expected, "metrics_duration": args.metrics_duration},
+        # A server that hangs without exiting would otherwise block the sweep forever.
+        args.connect_timeout + args.metrics_duration + STEP_TIMEOUT_SLACK,
     )
 
-    metrics_done = False
-    stop_sent = False
     net_summary: dict[str, int] = {}
+    if args.stop_delay > 0:
+        await asyncio.sleep(args.stop_delay)
+    if args.net_iface and args.net_clients:
+        net_summary = _parse_net_summary(_run_net_counter(args, "summary"))
+    if net_summary:
+        _update_metrics_csv(metrics_path, net_summary)
+    return net_summary
 
+
+async def run_sweep(args: argparse.Namespace, server_args: list[str], metrics_path: Path) -> None:
+    url = _control_url(server_args)
+    proc = await start_server(args, server_args)
     assert proc.stdout is not None
-    while True:
-        line = proc.stdout.readline()
-        if not line:
-            break
-        sys.stdout.write(f"[{expected}] {line}")
-        sys.stdout.flush()
-
-        if METRICS_DONE in line:
-            metrics_done = True
-        if metrics_done and not stop_sent:
-            if args.stop_delay > 0:
-                time.sleep(args.stop_delay)
+    state = {"expected": args.start}
+    forward = asyncio.create_task(_forward_output(proc.stdout, state))
+
+    failed = False
+    try:
+        if not await _wait_for_server(proc, url):
+            print(f"[sweep] server did not accept connections at {url}", flush=True)
+            failed = True
+            return
+        for expected in range(args.start, args.end + 1):
+            state["expected"] = expected
             if args.net_iface and args.net_clients:
-                net_summary = _parse_net_summary(_run_net_counter(args, "summary"))
+                _run_net_counter(args, "reset")
+            try:
+                await run_step(expected, args, url, metrics_path)
+            except OSError as exc:
+                print(f"[sweep] metrics request failed for expected_clients={expected}: {exc}", flush=True)
+                failed = True
+                break
+    finally:
+        if proc.returncode is None:
             proc.send_signal(signal.SIGINT)
-            stop_sent = True
+        code = await proc.wait()
+        await forward
 
-    code = proc.wait()
-    if net_summary:
-        _update_metrics_csv(metrics_path, net_summary)
-    return code, net_summary
+    if code not in (0, -signal.SIGINT):
+        print(f"[sweep] server exited with code {code}; stopping")
+        sys.exit(code)
+    if failed:
+        sys.exit(1)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(
-        description="Run WebRTC server metrics for a range of expected client counts."
+        description=(
+            "Run WebRTC server metrics for a range of expected client counts, "
+            "reusing one server process driven through POST /sweep/next."
+        )
     )
     parser.add_argument("--start", type=int, default=1, help="Starting expected client count")
     parser.add_argument("--end", type=int, default=50, help="Ending expected client count (inclusive)")
@@ -205,7 +358,7 @@ def main() -> None:
         "--stop-delay",
         type=float,
         default=1.0,
-        help="Seconds to wait after metrics complete before stopping the server",
+        help="Seconds to wait after each metrics window before reading net counters",
     )
     parser.add_argument("--net-iface", default=None, help="Interface name for net counters (e.g. eth0)")
     parser.add_argument(
@@ -231,24 +384,23 @@ def main() -> None:
     parser.add_argument("server_args", nargs=argparse.REMAINDER)
     args = parser.parse_args()
 
-    server_dir = Path(__file__).resolve().parent
-    base_dir = Path(args.workdir) if args.workdir else server_dir
+    base_dir = Path(args.workdir) if args.workdir else _SERVER_DIR
     server_args = list(args.server_args)
     if server_args[:1] == ["--"]:
         server_args = server_args[1:]
     metrics_path = _metrics_output_path(base_dir, server_args)
 
+    args.net_counter_path = None
     if args.net_iface and args.net_clients:
+        script_path = _counter_script_path(args)
+        if script_path.exists():
+            args.net_counter_path = script_path
+        else:
+            print(f"[sweep] net counter script not found at {script_path}")
+    if args.net_counter_path is not None:
         _run_net_counter(args, "setup")
 
-    for expected in range(args.start, args.end + 1):
-        if args.net_iface and args.net_clients:
-            _run_net_counter(args, "reset")
-        code, _ = run_server(expected, args, metrics_path)
-        if code not in (0, -signal.SIGINT):
-            print(f"[sweep] server exited with code {code}; stopping")
-            sys.exit(code if code != 0 else 1)
-        time.sleep(1)
+    asyncio.run(run_sweep(args, server_args, metrics_path))
 
 
 if __name__ == "__main__":
@@ -1,23 +1,203 @@
+import array
 import asyncio
+import concurrent.futures
+import hashlib
 import logging
 import os
+import queue
 import ssl
+import threading
 import time
 from pathlib import Path
-from urllib.parse import parse_qs
+from urllib.parse import parse_qsl
 import socket
 
+import orjson
 import socketio
 from aiohttp import web
 from aiortc import RTCSessionDescription
 import psutil
 
+try:
+    import uvloop
+except ImportError:  # not available on Windows; the stock loop still works
+    uvloop = None
+
 from cli import parse_args
 from media import open_media_source, stop_media_source
 from webrtc import WebRTCPeerManager
 
 
 ROOT = Path(__file__).parent
+_STATIC_DIR = ROOT / "static"
+_INDEX_PATH = _STATIC_DIR / "index.html"
+
+_PROC_STAT = "/proc/stat"
+_PROC_MEMINFO = "/proc/meminfo"
+_PROC_SELF_STAT = "/proc/self/stat"
+_PROC_NET_DEV = "/proc/net/dev"
+HAVE_PROCFS = os.path.exists(_PROC_SELF_STAT)
+# Memory totals move slowly compared to CPU and network counters.
+MEMINFO_EVERY = 5
+_PROC_READ_SIZE = 65536
+
+
+class _ProcSampler:
+    """Read the counters the metrics monitor needs straight from /proc (Linux only)."""
+
+    def __init__(self) -> None:
+        self._ticks_per_sec = os.sysconf("SC_CLK_TCK")
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        # Held open for the monitor's lifetime: procfs regenerates a file's contents on
+        # every read from offset 0, so pread replaces an open/read/close per tick.
+        self._fds = {
+            path: os.open(path, os.O_RDONLY)
+            for path in (_PROC_STAT, _PROC_MEMINFO, _PROC_SELF_STAT, _PROC_NET_DEV)
+        }
+
+    def close(self) -> None:
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+
+    def _read(self, path: str) -> bytes:
+        fd = self._fds[path]
+        data = os.pread(fd, _PROC_READ_SIZE, 0)
+        if len(data) < _PROC_READ_SIZE:
+            return data
+        chunks = [data]
+        offset = len(data)
+        while chunk := os.pread(fd, _PROC_READ_SIZE, offset):
+            chunks.append(chunk)
+            offset += len(chunk)
+        return b"".join(chunks)
+
+    def sys_cpu_times(self) -> tuple[int, int]:
+        """Return (busy, total) jiffies from the aggregate cpu line of /proc/stat."""
+        line = self._read(_PROC_STAT).split(b"\n", 1)[0]
+        # user nice system idle iowait irq softirq steal; guest time is already in user.
+        fields = [int(v) for v in line.split()[1:9]]
+        total = sum(fields)
+        return total - fields[3] - fields[4], total
+
+    def mem_percent(self) -> float:
+        total = available = 0
+        for line in self._read(_PROC_MEMINFO).splitlines():
+            if line.startswith(b"MemTotal:"):
+                total = int(line.split()[1])
+            elif line.startswith(b"MemAvailable:"):
+                available = int(line.split()[1])
+                break
+        return (total - available) / total * 100.0 if total else 0.0
+
+    def proc_times(self) -> tuple[float, int]:
+        """Return (cpu seconds, rss bytes) for this process."""
+        data = self._read(_PROC_SELF_STAT)
+        # Fields after the parenthesised comm start at "state" (field 3 in proc(5)).
+        fields = data[data.rindex(b")") + 2 :].split()
+        cpu_secs = (int(fields[11]) + int(fields[12])) / self._ticks_per_sec
+        return cpu_secs, int(fields[21]) * self._page_size
+
+    def net_bytes(self, interface: bytes | None) -> tuple[int, int] | None:
+        """Return (rx, tx) bytes for one interface, or summed over all when interface is None."""
+        rx = tx = 0
+        for line in self._read(_PROC_NET_DEV).splitlines()[2:]:
+            name, _, counters = line.partition(b":")
+            fields = counters.split()
+            if interface is not None:
+                if name.strip() == interface:
+                    return int(fields[0]), int(fields[8])
+                continue
+            rx += int(fields[0])
+            tx += int(fields[8])
+        return None if interface is not None else (rx, tx)
+
+
+# Slot order of ServerMetricsMonitor._sums.
+SAMPLE_KEYS = ("sys_cpu", "sys_mem", "proc_cpu", "proc_rss_mb", "rx_kbps", "tx_kbps")
+
+# Summary CSV columns and their format specs: the single source of column order.
+SUMMARY_COLUMNS = (
+    ("timestamp", ""),
+    ("session_id", ""),
+    ("expected_clients", ""),
+    ("connected_clients", ""),
+    ("duration_sec", ".1f"),
+    ("avg_sys_cpu_pct", ".2f"),
+    ("avg_sys_mem_pct", ".2f"),
+    ("avg_proc_cpu_pct", ".2f"),
+    # The server process is reused across sweep steps, so the absolute RSS also holds
+    # the previous steps' high-water mark and the pooled idle peers; the delta is
+    # measured against the RSS at the start of this window.
+    ("avg_proc_rss_mb", ".1f"),
+    ("avg_proc_rss_delta_mb", ".1f"),
+    ("avg_net_rx_kbps", ".2f"),
+    ("avg_net_tx_kbps", ".2f"),
+    ("samples", ""),
+)
+SUMMARY_HEADER = ",".join(name for name, _ in SUMMARY_COLUMNS) + "\n"
+_SUMMARY_LINE = ",".join(
+    f"{{{name}:{spec}}}" if spec else f"{{{name}}}" for name, spec in SUMMARY_COLUMNS
+) + "\n"
+
+
+class AsyncSummaryWriter:
+    """Append summary rows to a CSV from a background thread, off the event loop."""
+
+    def __init__(self, path: Path, header: str) -> None:
+        self.path = path
+        self.header = header
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._drain, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, line: str) -> concurrent.futures.Future:
+        """Queue one CSV line; the returned future resolves once it is on disk."""
+        if self._closed:
+            raise RuntimeError("summary writer is closed")
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._queue.put((line, future))
+        return future
+
+    def close(self) -> None:
+        """Write every line submitted so far, then stop the thread; later submits raise."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _drain(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stop = None in batch
+            items = [item for item in batch if item is not None]
+            if items:
+                self._write_batch(items)
+            if stop:
+                return
+
+    def _write_batch(self, items: list[tuple[str, concurrent.futures.Future]]) -> None:
+        # Skip lines whose waiter was cancelled before the thread got to them.
+        items = [item for item in items if item[1].set_running_or_notify_cancel()]
+        if not items:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Opened per batch rather than held: the sweep driver rewrites this file between steps.
+            with self.path.open("a", buffering=65536) as f:
+                if f.tell() == 0:
+                    f.write(self.header)
+                f.writelines(line for line, _ in items)
+        except Exception as exc:
+            for _, future in items:
+                future.set_exception(exc)
+        else:
+            for _, future in items:
+                future.set_result(None)
 
 
 class ServerMetricsMonitor:
@@ -36,16 +216,59 @@ class ServerMetricsMonitor:
         self.duration = duration
         self.output_path = output_path
         self.net_interface = net_interface
-        self.proc = psutil.Process(os.getpid())
+        self.proc = psutil.Process()
+        # The CPU count does not change at runtime; normalise with a multiply per tick.
+        self._inv_cpu_count = 1.0 / (psutil.cpu_count() or 1)
+        # psutil stays as the fallback on platforms without procfs.
+        self._procfs = _ProcSampler() if HAVE_PROCFS else None
+        self._net_interface_b = net_interface.encode() if net_interface else None
         self._net_interface_missing_logged = False
-        self._prev_net = self._get_net_counters()
-        self._connected: set[str] = set()
+        self._connected_map: dict[str, bool] = {}
+        self._n_connected = 0
         self._sid_to_client_id: dict[str, str] = {}
         self._started = False
         self._start_ts: float | None = None
-        self._samples: list[dict[str, float]] = []
-        psutil.cpu_percent(interval=None)
-        self.proc.cpu_percent(interval=None)
+        # Created in run(), where a running loop is guaranteed.
+        self._all_connected: asyncio.Event | None = None
+        self._sums = array.array("d", bytes(8 * len(SAMPLE_KEYS)))
+        self._n = 0
+        self._max_connected = 0
+        self._mem_pct = 0.0
+        self._writer = AsyncSummaryWriter(output_path, SUMMARY_HEADER)
+        self._prime()
+
+    def reset(self, expected_clients: int, duration: float) -> None:
+        """Start a fresh metrics window (used when one server process serves a whole sweep)."""
+        self.expected_clients = expected_clients
+        self.duration = duration
+        self._started = False
+        self._start_ts = None
+        # Peers left over from the previous step must not count toward this one;
+        # only connections established after the reset are tracked.
+        self._connected_map.clear()
+        self._n_connected = 0
+        self._sums = array.array("d", bytes(8 * len(SAMPLE_KEYS)))
+        self._n = 0
+        self._max_connected = 0
+        self._prime()
+
+    def _prime(self) -> None:
+        """Take baseline readings so the first sample reports deltas over one interval.
+
+        Also records the process RSS that avg_proc_rss_delta_mb is measured against.
+        """
+        now = time.monotonic()
+        if self._procfs:
+            self._prev_sys_cpu = self._procfs.sys_cpu_times()
+            proc_secs, rss = self._procfs.proc_times()
+            self._prev_proc_cpu = (proc_secs, now)
+        else:
+            psutil.cpu_percent(interval=None)
+            self.proc.cpu_percent(interval=None)
+            rss = self.proc.memory_info().rss
+        self._rss_baseline_mb = rss / (1024**2)
+        self._tick = 0
+        self._prev_net = (*self._net_bytes(), now)
 
     def register_sid(self, sid: str, client_id: str | None) -> None:
         if client_id:
@@ -57,18 +280,35 @@ class ServerMetricsMonitor:
     def mark_connected(self, sid: str) -> None:
         if self._is_warmup(sid):
             return
-        self._connected.add(sid)
+        if self._connected_map.get(sid):
+            return
+        self._connected_map[sid] = True
+        self._n_connected += 1
+        if self._all_connected is not None and self._n_connected >= self.expected_clients:
+            self._all_connected.set()
 
     def mark_disconnected(self, sid: str) -> None:
-        self._connected.discard(sid)
+        if not self._connected_map.pop(sid, False):
+            return
+        self._n_connected -= 1
+        if self._all_connected is not None and self._n_connected < self.expected_clients:
+            self._all_connected.clear()
 
     def connected_count(self) -> int:
-        return len(self._connected)
+        return self._n_connected
 
     def _is_warmup(self, sid: str) -> bool:
         client_id = self._sid_to_client_id.get(sid, "")
         return client_id.startswith("warmup")
 
+    def _log_missing_interface(self) -> None:
+        if not self._net_interface_missing_logged:
+            logging.warning(
+                "Network interface '%s' not found; using host-wide counters",
+                self.net_interface,
+            )
+            self._net_interface_missing_logged = True
+
     def _get_net_counters(self) -> psutil._common.snetio:
         if not self.net_interface:
             return psutil.net_io_counters()
@@ -76,110 +316,146 @@ class ServerMetricsMonitor:
         counters = pernic.get(self.net_interface)
         if counters:
             return counters
-        if not self._net_interface_missing_logged:
-            logging.warning(
-                "Network interface '%s' not found; using host-wide counters",
-                self.net_interface,
-            )
-            self._net_interface_missing_logged = True
+        self._log_missing_interface()
         return psutil.net_io_counters()
 
-    async def run(self) -> None:
+    def _net_bytes(self) -> tuple[int, int]:
+        if not self._procfs:
+            net = self._get_net_counters()
+            return net.bytes_recv, net.bytes_sent
+        counters = self._procfs.net_bytes(self._net_interface_b)
+        if counters is None:
+            self._log_missing_interface()
+            counters = self._procfs.net_bytes(None)
+        return counters
+
+    def _read_procfs(self, now: float) -> tuple[float, float, float, int]:
+        busy, total = self._procfs.sys_cpu_times()
+        prev_busy, prev_total = self._prev_sys_cpu
+        self._prev_sys_cpu = (busy, total)
+        cpu = (busy - prev_busy) / (total - prev_total) * 100.0 if total > prev_total else 0.0
+        if self._tick % MEMINFO_EVERY == 0:
+            self._mem_pct = self._procfs.mem_percent()
+        self._tick += 1
+        proc_secs, rss = self._procfs.proc_times()
+        prev_secs, prev_ts = self._prev_proc_cpu
+        self._prev_proc_cpu = (proc_secs, now)
+        proc_cpu = (proc_secs - prev_secs) / (now - prev_ts) * 100.0 if now > prev_ts else 0.0
+        return cpu, self._mem_pct, proc_cpu, rss
+
+    async def run(self) -> dict | None:
         if self.expected_clients <= 0:
-            return
+            return None
 
-        start_wait = time.monotonic()
-        while True:
-            await asyncio.sleep(0.2)
-            count = self.connected_count()
-            if count >= self.expected_clients:
-                self._started = True
-                self._start_ts = time.time()
-                start_mono = time.monotonic()
-                logging.info("All %s clients connected. Starting server metrics.", self.expected_clients)
-                break
-            if time.monotonic() - start_wait > self.connect_timeout:
-                logging.error(
-                    "Expected %s clients not reached within %.1fs; aborting.",
-                    self.expected_clients,
-                    self.connect_timeout,
-                )
-                os._exit(1)
+        self._all_connected = asyncio.Event()
+        if self.connected_count() >= self.expected_clients:
+            self._all_connected.set()
+        try:
+            await asyncio.wait_for(self._all_connected.wait(), timeout=self.connect_timeout)
+        except asyncio.TimeoutError:
+            logging.error(
+                "Expected %s clients not reached within %.1fs; aborting.",
+                self.expected_clients,
+                self.connect_timeout,
+            )
+            os._exit(1)
+        self._started = True
+        self._start_ts = time.time()
+        start_mono = time.monotonic()
+        logging.info("All %s clients connected. Starting server metrics.", self.expected_clients)
 
         if self.duration <= 0:
             logging.info("Metrics duration is %.1fs; skipping metrics collection.", self.duration)
-            return
+            return None
 
         while time.monotonic() - start_mono < self.duration:
             await asyncio.sleep(self.interval)
             self._record_sample(self.connected_count())
 
         logging.info("Metrics window complete (%.1fs).", self.duration)
-        self._write_summary()
+        return await self._write_summary()
 
-    def _record_sample(self, connected: int) -> None:
-        cpu = psutil.cpu_percent(interval=None)
-        mem = psutil.virtual_memory()
-        proc_cpu = self.proc.cpu_percent(interval=None) / psutil.cpu_count()
-        proc_rss_mb = self.proc.memory_info().rss / (1024**2)
-        net = self._get_net_counters()
-        rx_delta = net.bytes_recv - self._prev_net.bytes_recv
-        tx_delta = net.bytes_sent - self._prev_net.bytes_sent
-        self._prev_net = net
-        rx_kbps = (rx_delta * 8) / (self.interval * 1000)
-        tx_kbps = (tx_delta * 8) / (self.interval * 1000)
-        self._samples.append(
-            {
-                "connected": float(connected),
-                "sys_cpu": cpu,
-                "sys_mem": mem.percent,
-                "proc_cpu": proc_cpu,
-                "proc_rss_mb": proc_rss_mb,
-                "rx_kbps": rx_kbps,
-                "tx_kbps": tx_kbps,
-            }
-        )
+    def close(self) -> None:
+        self._writer.close()
+        if self._procfs:
+            self._procfs.close()
 
-    def _write_summary(self) -> None:
-        if not self._samples or self._start_ts is None:
-            return
+    def _record_sample(self, connected: int) -> None:
+        now = time.monotonic()
+        if self._procfs:
+            cpu, mem_pct, proc_cpu, rss = self._read_procfs(now)
+        else:
+            cpu = psutil.cpu_percent(interval=None)
+            mem_pct = psutil.virtual_memory().percent
+            proc_cpu = self.proc.cpu_percent(interval=None)
+            rss = self.proc.memory_info().rss
+        proc_cpu *= self._inv_cpu_count
+        proc_rss_mb = rss / (1024**2)
+        rx, tx = self._net_bytes()
+        prev_rx, prev_tx, prev_ts = self._prev_net
+        self._prev_net = (rx, tx, now)
+        # Rates use the measured gap; asyncio.sleep(interval) routinely overshoots.
+        kbps_factor = 8.0 / ((now - prev_ts or self.interval) * 1000.0)
+        rx_kbps = (rx - prev_rx) * kbps_factor
+        tx_kbps = (tx - prev_tx) * kbps_factor
+        sums = self._sums
+        sums[0] += cpu
+        sums[1] += mem_pct
+        sums[2] += proc_cpu
+        sums[3] += proc_rss_mb
+        sums[4] += rx_kbps
+        sums[5] += tx_kbps
+        self._n += 1
+        if connected > self._max_connected:
+            self._max_connected = connected
+
+    async def _write_summary(self) -> dict | None:
+        if not self._n or self._start_ts is None:
+            return None
         duration = time.time() - self._start_ts
-        avg = lambda key: sum(s[key] for s in self._samples) / len(self._samples)
+        sys_cpu, sys_mem, proc_cpu, proc_rss_mb, rx_kbps, tx_kbps = (v / self._n for v in self._sums)
         row = {
             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
             "session_id": time.strftime("%Y%m%d-%H%M%S", time.localtime(self._start_ts)),
             "expected_clients": self.expected_clients,
-            "connected_clients": int(max(s["connected"] for s in self._samples)),
+            "connected_clients": self._max_connected,
             "duration_sec": duration,
-            "avg_sys_cpu_pct": avg("sys_cpu"),
-            "avg_sys_mem_pct": avg("sys_mem"),
-            "avg_proc_cpu_pct": avg("proc_cpu"),
-            "avg_proc_rss_mb": avg("proc_rss_mb"),
-            "avg_net_rx_kbps": avg("rx_kbps"),
-            "avg_net_tx_kbps": avg("tx_kbps"),
-            "samples": len(self._samples),
+            "avg_sys_cpu_pct": sys_cpu,
+            "avg_sys_mem_pct": sys_mem,
+            "avg_proc_cpu_pct": proc_cpu,
+            "avg_proc_rss_mb": proc_rss_mb,
+            "avg_proc_rss_delta_mb": proc_rss_mb - self._rss_baseline_mb,
+            "avg_net_rx_kbps": rx_kbps,
+            "avg_net_tx_kbps": tx_kbps,
+            "samples": self._n,
         }
-        header = (
-            "timestamp,session_id,expected_clients,connected_clients,duration_sec,"
-            "avg_sys_cpu_pct,avg_sys_mem_pct,avg_proc_cpu_pct,avg_proc_rss_mb,"
-            "avg_net_rx_kbps,avg_net_tx_kbps,samples\n"
-        )
-        line = (
-            f"{row['timestamp']},{row['session_id']},{row['expected_clients']},{row['connected_clients']},"
-            f"{row['duration_sec']:.1f},{row['avg_sys_cpu_pct']:.2f},{row['avg_sys_mem_pct']:.2f},"
-            f"{row['avg_proc_cpu_pct']:.2f},{row['avg_proc_rss_mb']:.1f},{row['avg_net_rx_kbps']:.2f},"
-            f"{row['avg_net_tx_kbps']:.2f},{row['samples']}\n"
-        )
-        self.output_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.output_path.exists():
-            self.output_path.write_text(header + line)
-        else:
-            with self.output_path.open("a") as f:
-                f.write(line)
+        line = _SUMMARY_LINE.format_map(row)
+        # Awaited so the row is on disk before /sweep/next replies and the driver patches it.
+        await asyncio.wrap_future(self._writer.submit(line))
+        return row
+
+
+class _OrjsonCodec:
+    """Module-like JSON codec for python-socketio backed by orjson."""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        # socketio passes json-module kwargs (e.g. separators); orjson output is already compact.
+        return orjson.dumps(obj).decode()
 
+    @staticmethod
+    def loads(data, *args, **kwargs):
+        return orjson.loads(data)
 
-async def index(request: web.Request) -> web.StreamResponse:
-    return web.FileResponse(ROOT / "static" / "index.html")
+
+def _orjson_response(data, status: int = 200) -> web.Response:
+    return web.Response(body=orjson.dumps(data), status=status, content_type="application/json")
+
+
+def _answer_payload(pc) -> dict[str, str]:
+    """Answer SDP shared by the HTTP and Socket.IO signaling paths."""
+    desc = pc.localDescription
+    return {"sdp": desc.sdp, "type": desc.type}
 
 
 def create_app(config, source=None) -> web.Application:
@@ -190,6 +466,7 @@ def create_app(config, source=None) -> web.Application:
         async_mode="aiohttp",
         cors_allowed_origins="*",
         transports=["websocket"],
+        json=_OrjsonCodec,
     )
     monitor = ServerMetricsMonitor(
         expected_clients=config.expected_clients,
@@ -200,6 +477,22 @@ def create_app(config, source=None) -> web.Application:
         net_interface=config.metrics_net_interface,
     )
 
+    monitor_lock = asyncio.Lock()
+    # Running metrics windows; on_shutdown cancels them before closing the sampler and writer.
+    monitor_tasks: set[asyncio.Task] = set()
+
+    def _start_monitor() -> asyncio.Task:
+        task = asyncio.create_task(monitor.run())
+        monitor_tasks.add(task)
+        task.add_done_callback(monitor_tasks.discard)
+        return task
+
+    # index.html is fixed for the life of the process: read it once and answer
+    # revalidations with 304 instead of opening and stat-ing the file per hit.
+    index_body = _INDEX_PATH.read_bytes()
+    index_etag = '"%s"' % hashlib.md5(index_body, usedforsecurity=False).hexdigest()
+    index_headers = {"ETag": index_etag, "Cache-Control": "no-cache"}
+
     app = web.Application()
     app["config"] = config
     app["media_source"] = media_source
@@ -207,19 +500,30 @@ def create_app(config, source=None) -> web.Application:
     app["sio"] = sio
     sio.attach(app)
 
+    async def index(request: web.Request) -> web.Response:
+        if request.headers.get("If-None-Match") == index_etag:
+            return web.Response(status=304, headers=index_headers)
+        return web.Response(body=index_body, content_type="text/html", headers=index_headers)
+
     def _client_id_from_environ(environ: dict) -> str | None:
-        query_string = environ.get("QUERY_STRING") or ""
-        if not query_string:
+        query_string = environ.get("QUERY_STRING")
+        # "lient" covers both clientId and clientid; skip parsing when neither can match.
+        if not query_string or "lient" not in query_string:
             return None
-        params = parse_qs(query_string)
-        client_ids = params.get("clientId") or params.get("clientid")
-        return client_ids[0] if client_ids else None
+        # Stop at the first clientId instead of building a dict of every parameter.
+        fallback = None
+        for key, value in parse_qsl(query_string):
+            if key == "clientId":
+                return value
+            if key == "clientid" and fallback is None:
+                fallback = value
+        return fallback
 
     async def offer(request: web.Request) -> web.Response:
-        params = await request.json()
+        params = orjson.loads(await request.read())
         offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
         pc = await peer_manager.create_peer_connection(offer)
-        return web.json_response({"sdp": pc.localDescription.sdp, "type": pc.localDescription.type})
+        return _orjson_response(_answer_payload(pc))
 
     @sio.event
     async def connect(sid, environ) -> None:
@@ -253,21 +557,36 @@ def create_app(config, source=None) -> web.Application:
                 monitor.mark_disconnected(cb_sid)
 
         pc = await peer_manager.create_peer_connection(offer, sid=sid, state_callback=_state_callback)
-        await sio.emit(
-            "answer",
-            {"sdp": pc.localDescription.sdp, "type": pc.localDescription.type},
-            to=sid,
-        )
+        await sio.emit("answer", _answer_payload(pc), to=sid)
 
     @sio.on("candidate")  # type: ignore
     async def on_socket_candidate(sid, data) -> None:
         await peer_manager.add_candidate(sid, data)
 
+    async def sweep_next(request: web.Request) -> web.Response:
+        """Run one metrics window for the next sweep step and reply with its summary."""
+        if monitor_lock.locked():
+            return _orjson_response({"error": "metrics window already running"}, status=409)
+        params = orjson.loads(await request.read())
+        async with monitor_lock:
+            await peer_manager.prewarm(int(params["expected_clients"]))
+            monitor.reset(
+                int(params["expected_clients"]),
+                float(params.get("metrics_duration", monitor.duration)),
+            )
+            summary = await _start_monitor()
+        return _orjson_response(summary or {})
+
     async def on_startup(app: web.Application) -> None:
         if config.expected_clients > 0:
-            asyncio.create_task(monitor.run())
+            asyncio.create_task(peer_manager.prewarm(config.expected_clients))
+            _start_monitor()
 
     async def on_shutdown(app: web.Application) -> None:
+        for task in monitor_tasks:
+            task.cancel()
+        await asyncio.gather(*monitor_tasks, return_exceptions=True)
+
         try:
             await sio.shutdown()
         except Exception:
@@ -275,17 +594,24 @@ def create_app(config, source=None) -> web.Application:
 
         await stop_media_source(media_source)
         await peer_manager.close_all()
+        monitor.close()
 
     app.on_shutdown.append(on_shutdown)
     app.on_startup.append(on_startup)
     app.router.add_post("/offer", offer)
+    if config.sweep_control:
+        app.router.add_post("/sweep/next", sweep_next)
     app.router.add_get("/", index)
-    app.router.add_static("/static/", ROOT / "static")
+    app.router.add_static("/static/", _STATIC_DIR, show_index=False, append_version=False)
     return app
 
 
 def main() -> None:
     args = parse_args()
+    # libuv-backed loop for the socket-heavy signaling and DTLS/SRTP traffic;
+    # run_app creates its loop through the installed policy.
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
     logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
 
@@ -325,6 +651,8 @@ def main() -> None:
         port=args.port,
         ssl_context=ssl_context,
         shutdown_timeout=1.0,
+        # No per-request access log lines on the signaling path.
+        access_log=None,
     )
 
 
@@ -1,15 +1,28 @@
 import argparse
 import asyncio
-import json
+import functools
 import logging
 import time
-from typing import Callable, Dict, Optional, Set
+import weakref
+from typing import Callable, Dict, Optional
 
-from aiortc import RTCPeerConnection, RTCRtpSender, RTCSessionDescription
+import orjson
+from aiortc import RTCPeerConnection, RTCRtpSender, RTCRtpTransceiver, RTCSessionDescription
 from aiortc.contrib.media import MediaPlayer, MediaRelay
 from aiortc.mediastreams import MediaStreamTrack
 from aiortc.sdp import candidate_from_sdp
 
+LOG = logging.getLogger(__name__)
+
+# Per-sid trickle ICE state kept in WebRTCPeerManager._sid_state.
+_ICE_ACTIVE = 0
+_ICE_END_OF_CANDIDATES = 1
+
+# Upper bound on fresh peer connections kept ready ahead of incoming offers.
+PC_POOL_MAX = 64
+# Peers torn down at once by close_all; bounds the DTLS/SRTP teardown burst on shutdown.
+CLOSE_CONCURRENCY = 32
+
 
 class TimestampedVideoTrack(MediaStreamTrack):
     kind = "video"
@@ -34,25 +47,71 @@ class TimestampedVideoTrack(MediaStreamTrack):
                     "sendTimeMs": int(time.time() * 1000),
                 }
                 try:
-                    self._channel.send(json.dumps(payload))
+                    # Decoded so the browser receives a text message for JSON.parse.
+                    self._channel.send(orjson.dumps(payload).decode())
                 except Exception:
-                    logging.exception("Failed to send frame timestamp over data channel")
+                    LOG.exception("Failed to send frame timestamp over data channel")
         return frame
 
 
+async def _on_track_ended(track: MediaStreamTrack) -> None:
+    LOG.info("Track %s ended", track.id)
+
+
+def _on_track(pc: RTCPeerConnection, track: MediaStreamTrack) -> None:
+    LOG.info("Track %s received (%s)", track.id, track.kind)
+    track.on("ended", functools.partial(_on_track_ended, track))
+
+
 class WebRTCPeerManager:
     def __init__(self, config: argparse.Namespace, media_source: Optional[MediaPlayer]):
         self.config = config
         self.media_source = media_source
         self.relay = MediaRelay()
-        self.pcs: Set[RTCPeerConnection] = set()
+        # Running ICE/DTLS transport tasks keep a live peer reachable through their
+        # statechange listeners; once it is closed the entry drops out by itself.
+        self.pcs: weakref.WeakSet[RTCPeerConnection] = weakref.WeakSet()
         self.peers_by_sid: Dict[str, RTCPeerConnection] = {}
-        self.remote_end_of_candidates: Set[str] = set()
+        self._sid_by_pc: Dict[RTCPeerConnection, str] = {}
+        self._sid_state: Dict[str, int] = {}
         self._bitrate_unsupported_logged = False
+        # Filtered codec preferences per (kind, mimeType), built once for the forced codecs.
+        self._codec_cache: Dict[tuple[str, str], list] = {}
+        for codec in (config.audio_codec, config.video_codec):
+            if codec:
+                self._codec_preferences(codec)
+        # Never-negotiated peers built ahead of time: construction generates a DTLS
+        # certificate, which is the expensive part. Closed peers cannot be reused.
+        self._pc_pool: asyncio.Queue[RTCPeerConnection] = asyncio.Queue(maxsize=PC_POOL_MAX)
+        self._pool_target = 0
+        self._refill_task: Optional[asyncio.Task] = None
+
+    async def prewarm(self, count: int) -> None:
+        """Keep up to ``count`` fresh peer connections ready for incoming offers."""
+        self._pool_target = min(count, self._pc_pool.maxsize)
+        await self._fill_pool()
+
+    async def _fill_pool(self) -> None:
+        while self._pc_pool.qsize() < self._pool_target:
+            self._pc_pool.put_nowait(RTCPeerConnection())
+            # Yield between certificates so signaling is not starved.
+            await asyncio.sleep(0)
+
+    def _take_pc(self) -> RTCPeerConnection:
+        try:
+            pc = self._pc_pool.get_nowait()
+        except asyncio.QueueEmpty:
+            return RTCPeerConnection()
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._fill_pool())
+        return pc
 
     def _subscribe_tracks(
         self,
     ) -> tuple[Optional[MediaStreamTrack], Optional[MediaStreamTrack]]:
+        # Each sender consumes frames via recv(), so every peer needs its own relay
+        # proxy. Proxies stay buffered: an unbuffered proxy keeps only the latest
+        # frame, dropping audio and (with decode=False) breaking H.264 until the next IDR.
         audio = (
             self.relay.subscribe(self.media_source.audio)
             if self.media_source and self.media_source.audio
@@ -65,11 +124,41 @@ class WebRTCPeerManager:
         )
         return audio, video
 
-    def _force_codec(self, pc: RTCPeerConnection, sender: RTCRtpSender, codec: str):
+    async def _on_state_change(
+        self,
+        pc: RTCPeerConnection,
+        sid: Optional[str],
+        state_callback: Optional[Callable[[RTCPeerConnection, str, Optional[str]], None]],
+    ) -> None:
+        LOG.debug("Connection state is %s", pc.connectionState)
+        if state_callback:
+            try:
+                state_callback(pc, pc.connectionState, sid)
+            except Exception:
+                LOG.exception("Connection state callback failed")
+        if pc.connectionState in ("failed", "closed"):
+            await self.close_peer(pc)
+
+    @staticmethod
+    def _transceiver_for(pc: RTCPeerConnection, sender: RTCRtpSender) -> RTCRtpTransceiver:
+        # addTrack before setRemoteDescription appends a new transceiver, so the
+        # last one is normally the match; scan only if that assumption breaks.
+        transceivers = pc.getTransceivers()
+        if transceivers and transceivers[-1].sender is sender:
+            return transceivers[-1]
+        return next(t for t in transceivers if t.sender == sender)
+
+    def _codec_preferences(self, codec: str) -> list:
         kind = codec.split("/")[0]
-        codecs = RTCRtpSender.getCapabilities(kind).codecs
-        transceiver = next(t for t in pc.getTransceivers() if t.sender == sender)
-        transceiver.setCodecPreferences([c for c in codecs if c.mimeType == codec])
+        key = (kind, codec)
+        prefs = self._codec_cache.get(key)
+        if prefs is None:
+            prefs = [c for c in RTCRtpSender.getCapabilities(kind).codecs if c.mimeType == codec]
+            self._codec_cache[key] = prefs
+        return prefs
+
+    def _force_codec(self, transceiver: RTCRtpTransceiver, codec: str):
+        transceiver.setCodecPreferences(self._codec_preferences(codec))
 
     async def create_peer_connection(
         self,
@@ -77,36 +166,22 @@ class WebRTCPeerManager:
         sid: Optional[str] = None,
         state_callback: Optional[Callable[[RTCPeerConnection, str, Optional[str]], None]] = None,
     ) -> RTCPeerConnection:
-        pc = RTCPeerConnection()
+        pc = self._take_pc()
         timestamped_video: Optional[TimestampedVideoTrack] = None
         if sid:
             self.peers_by_sid[sid] = pc
-            self.remote_end_of_candidates.discard(sid)
+            self._sid_by_pc[pc] = sid
+            self._sid_state.pop(sid, None)
         self.pcs.add(pc)
-        logging.info("Created peer connection %s (sid=%s)", id(pc), sid or "-")
+        LOG.info("Created peer connection %s (sid=%s)", id(pc), sid or "-")
 
-        @pc.on("connectionstatechange")
-        async def on_state_change() -> None:
-            logging.info("Connection state is %s", pc.connectionState)
-            if state_callback:
-                try:
-                    state_callback(pc, pc.connectionState, sid)
-                except Exception:
-                    logging.exception("Connection state callback failed")
-            if pc.connectionState in ("failed", "closed"):
-                await self.close_peer(pc, sid=sid)
-
-        @pc.on("track")
-        def on_track(track) -> None:
-            logging.info("Track %s received (%s)", track.id, track.kind)
-
-            @track.on("ended")
-            async def on_ended() -> None:
-                logging.info("Track %s ended", track.id)
+        # Partials over shared handlers instead of per-peer closures.
+        pc.on("connectionstatechange", functools.partial(self._on_state_change, pc, sid, state_callback))
+        pc.on("track", functools.partial(_on_track, pc))
 
         @pc.on("datachannel")
         def on_datachannel(channel) -> None:
-            logging.info("Data channel created: %s", channel.label)
+            LOG.info("Data channel created: %s", channel.label)
 
             if channel.label == "qoe" and timestamped_video:
                 timestamped_video.set_data_channel(channel)
@@ -116,7 +191,7 @@ class WebRTCPeerManager:
                 if not isinstance(message, str):
                     return
                 try:
-                    payload = json.loads(message)
+                    payload = orjson.loads(message)
                 except Exception:
                     return
                 if payload.get("type") == "time_sync":
@@ -128,18 +203,18 @@ class WebRTCPeerManager:
                         "serverSendMs": int(time.time() * 1000),
                     }
                     try:
-                        channel.send(json.dumps(response))
+                        channel.send(orjson.dumps(response).decode())
                     except Exception:
-                        logging.exception("Failed to send time sync reply")
+                        LOG.exception("Failed to send time sync reply")
 
         audio, video = self._subscribe_tracks()
         if audio is None and video is None:
-            logging.warning("No media source available; answering without media tracks")
+            LOG.warning("No media source available; answering without media tracks")
 
         if audio:
             audio_sender = pc.addTrack(audio)
             if self.config.audio_codec:
-                self._force_codec(pc, audio_sender, self.config.audio_codec)
+                self._force_codec(self._transceiver_for(pc, audio_sender), self.config.audio_codec)
             elif self.config.play_without_decoding:
                 raise Exception("You must specify the audio codec using --audio-codec")
 
@@ -155,14 +230,14 @@ class WebRTCPeerManager:
                         params.encodings[0]["maxBitrate"] = int(self.config.video_bitrate) * 1000
                         await video_sender.setParameters(params)
                     except Exception:
-                        logging.exception("Failed to apply video bitrate constraint")
+                        LOG.exception("Failed to apply video bitrate constraint")
                 elif not self._bitrate_unsupported_logged:
                     self._bitrate_unsupported_logged = True
-                    logging.warning(
+                    LOG.warning(
                         "RTCRtpSender does not support getParameters; bitrate constraint skipped"
                     )
             if self.config.video_codec:
-                self._force_codec(pc, video_sender, self.config.video_codec)
+                self._force_codec(self._transceiver_for(pc, video_sender), self.config.video_codec)
             elif self.config.play_without_decoding:
                 raise Exception("You must specify the video codec using --video-codec")
 
@@ -170,72 +245,91 @@ class WebRTCPeerManager:
         answer = await pc.createAnswer()
         await pc.setLocalDescription(answer)
 
-        logging.info("Sending answer from peer connection %s", id(pc))
+        LOG.info("Sending answer from peer connection %s", id(pc))
         return pc
 
     async def add_candidate(self, sid: str, candidate: Optional[dict]) -> None:
         pc = self.peers_by_sid.get(sid)
         if not pc:
-            logging.warning("Received ICE candidate for unknown sid %s", sid)
+            LOG.warning("Received ICE candidate for unknown sid %s", sid)
             return
 
         # Browsers signal end-of-candidates either with a null payload or an empty
         # candidate string. Once seen, ignore any further trickle to avoid
         # aioice errors about end-of-candidates.
-        if candidate is None or not candidate.get("candidate"):
-            if sid in self.remote_end_of_candidates:
-                logging.warning("Duplicate end-of-candidates from %s", sid)
+        ended = self._sid_state.get(sid, _ICE_ACTIVE) == _ICE_END_OF_CANDIDATES
+        sdp_candidate = candidate.get("candidate") if candidate is not None else None
+        if not sdp_candidate:
+            if ended:
+                LOG.debug("Duplicate end-of-candidates from %s", sid)
                 return
-            self.remote_end_of_candidates.add(sid)
+            self._sid_state[sid] = _ICE_END_OF_CANDIDATES
             await pc.addIceCandidate(None)
             return
 
-        if sid in self.remote_end_of_candidates:
-            logging.warning("Received ICE candidate after end-of-candidates from %s", sid)
-            return
-
-        if "candidate" not in candidate:
-            logging.warning("Malformed ICE candidate from %s: %s", sid, candidate)
+        if ended:
+            LOG.debug("Received ICE candidate after end-of-candidates from %s", sid)
             return
 
         try:
-            ice_candidate = candidate_from_sdp(candidate["candidate"])
+            ice_candidate = candidate_from_sdp(sdp_candidate)
             ice_candidate.sdpMid = candidate.get("sdpMid")
             ice_candidate.sdpMLineIndex = candidate.get("sdpMLineIndex")
             await pc.addIceCandidate(ice_candidate)
         except ValueError as exc:
             if "after end-of-candidates" in str(exc).lower():
-                already_marked = sid in self.remote_end_of_candidates
-                self.remote_end_of_candidates.add(sid)
-                if not already_marked:
-                    logging.info("Peer %s sent candidate after end-of-candidates; ignoring", sid)
+                # Re-read: the state may have changed while addIceCandidate was awaited.
+                if self._sid_state.get(sid, _ICE_ACTIVE) != _ICE_END_OF_CANDIDATES:
+                    self._sid_state[sid] = _ICE_END_OF_CANDIDATES
+                    LOG.debug("Peer %s sent candidate after end-of-candidates; ignoring", sid)
                 return
-            logging.exception("Error adding ICE candidate from %s", sid)
+            LOG.exception("Error adding ICE candidate from %s", sid)
         except Exception:
-            logging.exception("Error adding ICE candidate from %s", sid)
-
-    async def close_peer(self, pc: RTCPeerConnection, sid: Optional[str] = None) -> None:
-        if sid and self.peers_by_sid.get(sid) is pc:
-            self.peers_by_sid.pop(sid, None)
-        else:
-            for key, value in list(self.peers_by_sid.items()):
-                if value is pc:
-                    self.peers_by_sid.pop(key, None)
-                    break
-
-        if pc in self.pcs:
-            self.pcs.discard(pc)
+            LOG.exception("Error adding ICE candidate from %s", sid)
+
+    async def close_peer(self, pc: RTCPeerConnection) -> None:
+        # Peers from the HTTP /offer path have no sid and are not in either map.
+        mapped_sid = self._sid_by_pc.pop(pc, None)
+        # The sid may already point at a newer peer after a renegotiation.
+        if mapped_sid is not None and self.peers_by_sid.get(mapped_sid) is pc:
+            self.peers_by_sid.pop(mapped_sid, None)
+
+        # pc.close() ends by firing "closed", whose handler runs later and lands here again.
+        if pc.connectionState == "closed":
+            return
+        await self._close_pc(pc)
+
+    async def _close_pc(self, pc: RTCPeerConnection) -> None:
         try:
             await pc.close()
         except Exception:
-            logging.exception("Error closing peer connection %s", id(pc))
+            LOG.exception("Error closing peer connection %s", id(pc))
 
     async def close_for_sid(self, sid: str) -> None:
         pc = self.peers_by_sid.pop(sid, None)
-        self.remote_end_of_candidates.discard(sid)
+        self._sid_state.pop(sid, None)
         if pc:
-            await self.close_peer(pc, sid=sid)
+            self._sid_by_pc.pop(pc, None)
+            await self.close_peer(pc)
 
     async def close_all(self) -> None:
-        tasks = [self.close_peer(pc) for pc in list(self.pcs)]
-        await asyncio.gather(*tasks, return_exceptions=True)
+        # Drop all bookkeeping up front, then close peers concurrently in bounded batches.
+        self._pool_target = 0
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+        while not self._pc_pool.empty():
+            self._pc_pool.get_nowait()
+        snapshot = tuple(self.pcs)
+        self.pcs.clear()
+        self.peers_by_sid.clear()
+        self._sid_by_pc.clear()
+        self._sid_state.clear()
+        sem = asyncio.Semaphore(CLOSE_CONCURRENCY)
+
+        async def close_one(pc: RTCPeerConnection) -> None:
+            async with sem:
+                await self.close_peer(pc)
+
+        async with asyncio.TaskGroup() as tg:
+            for pc in snapshot:
+                tg.create_task(close_one(pc))